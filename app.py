@@ -1,8 +1,14 @@
 import pandas as pd
+import numpy as np
 import streamlit as st
+import io
+import logging
 import os
 import shutil
 from datetime import datetime
+from itertools import chain
+
+logger = logging.getLogger(__name__)
 
 def backup_data():
     """Create backup of scored_physicians.csv before overwriting"""
@@ -17,21 +23,36 @@ def backup_data():
     shutil.copy2(src, dst)
     return dst
 
+def read_source_data():
+    """Read physician data, preferring a Parquet sidecar that is newer than the CSV"""
+    src = "scored_physicians.csv"
+    cache = "scored_physicians.parquet"
+    if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(src):
+        try:
+            return pd.read_parquet(cache, dtype_backend='pyarrow')
+        except (OSError, ValueError) as e:
+            # Arrow read errors subclass these; fall back to the CSV and rebuild the sidecar
+            logger.warning("Ignoring unreadable %s, re-reading CSV: %s", cache, e)
+
+    df = pd.read_csv(src, engine='pyarrow', dtype_backend='pyarrow')
+    try:
+        df.to_parquet(cache, index=False)
+    except OSError:
+        pass  # Read-only checkout; keep serving from the CSV
+    return df
+
 # --- Load Data ---
-@st.cache_data(ttl=3600, max_entries=100)
-def load_data():
+# Shared across sessions without a per-read copy; callers must treat it as read-only
+@st.cache_resource(ttl=3600, max_entries=100)
+def _load_data_shared():
     try:
-        # Create backup first
-        backup_file = backup_data()
-        st.info(f"Created backup at: {backup_file}")
-        
-        # Now load the new data
-        df = pd.read_csv("scored_physicians.csv")
+        df = read_source_data()
         
         # Validate required columns
         required_columns = [
             'npi', 'full_name', 'primary_specialty', 'license_states',
-            'multi_state_licensed', 'locum_candidate_flag', 'recruiter_priority_score'
+            'multi_state_licensed', 'locum_candidate_flag', 'recruiter_priority_score',
+            'status', 'phone', 'practice_address'
         ]
         missing_columns = [col for col in required_columns if col not in df.columns]
         if missing_columns:
@@ -41,28 +62,77 @@ def load_data():
     except FileNotFoundError:
         st.error("Error: The file 'scored_physicians.csv' was not found.")
         st.stop()
-    except pd.errors.EmptyDataError:
+    except (pd.errors.EmptyDataError, pd.errors.ParserError):
+        # The pyarrow engine reports an empty file as a ParserError
         st.error("Error: The file 'scored_physicians.csv' is empty or malformed.")
         st.stop()
     except Exception as e:
         st.error(f"Unexpected error loading data: {e}")
         st.stop()
 
-    df['license_states'] = df['license_states'].astype(str)
+    # Narrow dtypes so sidebar filters run on compact codes and 1-byte masks
+    df['status'] = df['status'].astype('category')
+    df['primary_specialty'] = df['primary_specialty'].astype('category')
+    df['multi_state_licensed'] = df['multi_state_licensed'].fillna(False).astype(bool)
+    df['locum_candidate_flag'] = df['locum_candidate_flag'].fillna(False).astype(bool)
+    df['recruiter_priority_score'] = pd.to_numeric(df['recruiter_priority_score'], downcast='integer')
+    # Specialty match is computed over the categories once, not on every rerun
+    df['is_emergency'] = df['primary_specialty'].str.contains(
+        'Emergency', case=False, regex=False, na=False
+    ).astype(bool)
+
+    # Repeated state combinations are stored once as categories
+    df['license_states'] = df['license_states'].fillna('').astype(str).astype('category')
     df['locum_keywords'] = df['locum_keywords'].astype(str)
-    df['license_states_list'] = df['license_states'].fillna('').apply(
-        lambda x: [s.strip() for s in x.split(',') if s.strip()]
+    # Split in the vectorized str accessor and keep one state set per row for filtering
+    states = df['license_states'].str.replace(' ', '', regex=False).str.strip(',')
+    df['license_states_set'] = states.str.split(',').map(
+        lambda xs: frozenset(x for x in xs if x)
     )
+    # Index by NPI so flagged lookups are keyed instead of a full-column scan
+    df = df.set_index('npi', drop=False)
+    # Load token for derived caches, so they are invalidated when the CSV changes
+    df.attrs['source_mtime'] = os.path.getmtime("scored_physicians.csv")
     return df
 
+@st.cache_data(ttl=3600, max_entries=4, show_spinner=False)
+def get_all_states(_states_sets, specialty, data_token):
+    """Sorted unique license states, cached per specialty selection and data load"""
+    states = np.array(list(chain.from_iterable(_states_sets)), dtype=str)
+    return np.unique(states).tolist()
+
+@st.cache_data(ttl=3600, max_entries=20, show_spinner=False)
+def _flag_csv(payload, _flagged_data):
+    """CSV export bytes, cached on the data load and the (npi, note) pairs exported"""
+    buf = io.BytesIO()
+    _flagged_data.to_csv(buf, index=False, lineterminator='\n', encoding='utf-8')
+    return buf.getvalue()
+
+@st.cache_resource(show_spinner=False)
+def _backup_once():
+    """Back up the CSV once per process; the result is shared by all sessions"""
+    try:
+        return {"file": backup_data(), "error": None, "shown": False}
+    except OSError as e:
+        return {"file": None, "error": str(e), "shown": False}
+
+# Back up outside the cached loader and report it in the first session only
+backup = _backup_once()
+if not backup["shown"]:
+    backup["shown"] = True
+    if backup["file"]:
+        st.info(f"Created backup at: {backup['file']}")
+    else:
+        st.warning(f"Could not create backup: {backup['error']}")
+
 # Load full data for dropdown consistency
-df_full = load_data()
-df = df_full.copy()
+df_full = _load_data_shared()
+df = df_full
+data_token = df_full.attrs['source_mtime']
 
 # --- Sidebar UI ---
-# Inject Bootstrap-inspired styling
-st.markdown("""
-    <style>
+# Bootstrap-inspired styling
+BASE_CSS = """
     html, body, [class*="css"] {
         font-family: 'Segoe UI', sans-serif;
     }
@@ -75,12 +145,6 @@ st.markdown("""
         margin-bottom: 1em;
     }
 
-    .stTextArea > div > textarea {
-        border-radius: 6px !important;
-        padding: 10px !important;
-        font-size: 0.95em !important;
-    }
-
     .stButton > button {
         border-radius: 6px;
         padding: 8px 16px;
@@ -111,42 +175,44 @@ st.markdown("""
     .stDataFrame {
         border-radius: 10px;
     }
-    </style>
-""", unsafe_allow_html=True)
+"""
+
+# Dark mode overrides, appended to the base styles when enabled
+DARK_CSS = """
+    html, body, [class*="css"] {
+        background-color: #1e1e1e !important;
+        color: #ffffff !important;
+    }
+    .stTextInput > div > div > input {
+        background-color: #2e2e2e !important;
+        color: #ffffff !important;
+    }
+    .stDataFrame, .stExpander {
+        background-color: #262626 !important;
+        color: #ffffff !important;
+    }
+    .dataframe {
+        background-color: #262626 !important;
+        color: #ffffff !important;
+    }
+    .dataframe th {
+        background-color: #363636 !important;
+        color: #ffffff !important;
+    }
+    .dataframe td {
+        background-color: #262626 !important;
+        color: #ffffff !important;
+    }
+"""
+
+def build_css(dark):
+    """Single <style> block for the current theme"""
+    css = BASE_CSS + DARK_CSS if dark else BASE_CSS
+    return f"<style>{css}</style>"
+
 st.sidebar.title("🔍 Recruiter Filters")
 dark_mode = st.sidebar.checkbox("🌙 Enable Dark Mode")
-
-# Dark Mode Styling
-if dark_mode:
-    st.markdown("""
-        <style>
-        html, body, [class*="css"] {
-            background-color: #1e1e1e !important;
-            color: #ffffff !important;
-        }
-        .stTextInput > div > div > input,
-        .stTextArea textarea {
-            background-color: #2e2e2e !important;
-            color: #ffffff !important;
-        }
-        .stDataFrame, .stExpander {
-            background-color: #262626 !important;
-            color: #ffffff !important;
-        }
-        .dataframe {
-            background-color: #262626 !important;
-            color: #ffffff !important;
-        }
-        .dataframe th {
-            background-color: #363636 !important;
-            color: #ffffff !important;
-        }
-        .dataframe td {
-            background-color: #262626 !important;
-            color: #ffffff !important;
-        }
-        </style>
-    """, unsafe_allow_html=True)
+st.markdown(build_css(dark_mode), unsafe_allow_html=True)
 
 # Sidebar filters
 st.sidebar.header('Filters')
@@ -159,11 +225,11 @@ specialty_filter = st.sidebar.radio(
 
 # Apply filters
 def filter_data(df):
-    filtered_df = df.copy()
+    filtered_df = df
     
     # Apply specialty filter
     if specialty_filter == 'Emergency Room Doctors':
-        filtered_df = filtered_df[filtered_df['primary_specialty'].str.contains('Emergency', case=False, na=False)]
+        filtered_df = filtered_df[filtered_df['is_emergency']]
     
     return filtered_df
 
@@ -172,13 +238,14 @@ df = filter_data(df)
 
 # License State Filter
 with st.sidebar.expander("🎯 License State Filter", expanded=False):
-    all_states = sorted(set(state for sublist in df['license_states_list'] for state in sublist))
+    all_states = get_all_states(df['license_states_set'], specialty_filter, data_token)
     selected_states = st.multiselect(
         "Select state(s) licensed in:",
         options=all_states,
         default=all_states
     )
-    df = df[df['license_states_list'].explode().isin(selected_states).groupby(level=0).any()]
+    sel = frozenset(selected_states)
+    mask = ~df['license_states_set'].map(sel.isdisjoint).to_numpy(dtype=bool)
 
 # Advanced Filters
 with st.sidebar.expander("⚙️ Advanced Filters", expanded=False):
@@ -187,13 +254,23 @@ with st.sidebar.expander("⚙️ Advanced Filters", expanded=False):
     locum_only = st.checkbox("Show Locum Candidates Only")
     min_score = st.slider("Minimum Recruiter Score", 0, 100, 20)
 
+# Combine all filters into one mask and slice the frame once
+multi_state = df['multi_state_licensed'].to_numpy(dtype=bool, na_value=False)
+locum = df['locum_candidate_flag'].to_numpy(dtype=bool, na_value=False)
 if active_only:
-    df = df[df['status'] == 'ACTIVE']
+    mask &= np.asarray(df['status'].values == 'ACTIVE')
 if multi_state_only:
-    df = df[df['multi_state_licensed']]
+    mask &= multi_state
 if locum_only:
-    df = df[df['locum_candidate_flag']]
-df = df[df['recruiter_priority_score'] >= min_score]
+    mask &= locum
+# Arrow-backed scores compare to <NA> when blank; treat those as failing the filter
+mask &= (df['recruiter_priority_score'] >= min_score).to_numpy(dtype=bool, na_value=False)
+df = df.loc[mask]
+
+# Metric counts come straight from the fused mask
+total_count = int(mask.sum())
+multi_state_count = int((mask & multi_state).sum())
+locum_count = int((mask & locum).sum())
 
 # --- Session state for flagging ---
 if "flagged" not in st.session_state:
@@ -206,40 +283,77 @@ st.caption("Curated and scored for recruiter targeting")
 
 # --- Metrics ---
 col1, col2, col3 = st.columns(3)
-col1.metric("🧾 Total Results", len(df))
-col2.metric("🌍 Multi-State Licensed", df['multi_state_licensed'].sum())
-col3.metric("🩺 Locum Candidates", df['locum_candidate_flag'].sum())
+col1.metric("🧾 Total Results", total_count)
+col2.metric("🌍 Multi-State Licensed", multi_state_count)
+col3.metric("🩺 Locum Candidates", locum_count)
 
 # --- Profile Cards ---
 st.markdown("### 📋 Physician Leads")
 
-for row in df.itertuples(index=False):
+# Paginate so each rerun only builds a fixed number of cards
+page_size = 25
+num_pages = max(1, (len(df) + page_size - 1) // page_size)
+page = st.number_input("Page", min_value=1, max_value=num_pages, value=1, step=1)
+st.caption(f"Page {page} of {num_pages}")
+view = df.iloc[(page - 1) * page_size : page * page_size]
+
+# Only project the fields each card shows; email is optional in the source CSV
+card_columns = [
+    col for col in [
+        "npi", "full_name", "primary_specialty", "recruiter_priority_score",
+        "status", "email", "phone", "practice_address", "license_states"
+    ] if col in view.columns
+]
+for row in view[card_columns].itertuples(index=False, name="Card"):
     with st.expander(f"{row.full_name} | {row.primary_specialty} | Score: {row.recruiter_priority_score}"):
-        col1, col2 = st.columns([3, 1])
-        with col1:
-            st.write(f"**NPI**: {row.npi}")
-            st.write(f"**Status**: {row.status}")
-            st.write(f"**Email**: {getattr(row, 'Email', 'N/A')}")
-            st.write(f"**Phone**: {row.phone}")
-            st.write(f"**Practice Address**: {row.practice_address}")
-            st.write(f"**License States**: {row.license_states}")
-        with col2:
-            current_note = st.session_state.flagged.get(row.npi, "")
-            note = st.text_area("Flag this candidate:", value=current_note, key=f"note_{row.npi}")
-            if note.strip():
-                st.session_state.flagged[row.npi] = note.strip()
+        st.write(f"**NPI**: {row.npi}")
+        st.write(f"**Status**: {row.status}")
+        st.write(f"**Email**: {getattr(row, 'email', 'N/A')}")
+        st.write(f"**Phone**: {row.phone}")
+        st.write(f"**Practice Address**: {row.practice_address}")
+        st.write(f"**License States**: {row.license_states}")
+
+# --- Flag Notes ---
+# A single editable grid replaces one text area per card
+st.markdown("### 📝 Flag Candidates")
+grid_columns = ["npi", "full_name", "primary_specialty", "recruiter_priority_score"]
+grid = df[grid_columns].copy()
+grid["flag_note"] = grid["npi"].map(st.session_state.flagged).fillna("").astype(str)
+edited = st.data_editor(
+    grid,
+    key="grid",
+    num_rows="fixed",
+    hide_index=True,
+    disabled=grid_columns,
+    column_config={"flag_note": st.column_config.TextColumn("Flag note")},
+)
+
+# Write back only the notes that changed; clearing a note unflags the candidate
+notes = edited["flag_note"].fillna("").astype(str).str.strip()
+changed = notes != grid["flag_note"]
+for npi, note in notes[changed].items():
+    if note:
+        st.session_state.flagged[npi] = note
+    else:
+        st.session_state.flagged.pop(npi, None)
 
 # --- Flagged Candidates ---
 if st.session_state.flagged:
     st.markdown("### 🏷️ Flagged Candidates")
-    flagged_data = df[df['npi'].isin(st.session_state.flagged.keys())].copy()
-    flagged_data["flag_note"] = flagged_data["npi"].apply(lambda n: st.session_state.flagged.get(n, ""))
+    flagged_npis = df.index.intersection(list(st.session_state.flagged))
+    flagged_data = df.loc[flagged_npis].copy()
+    flagged_data["flag_note"] = flagged_data["npi"].map(st.session_state.flagged).fillna("")
     display_columns = [col for col in ["full_name", "primary_specialty", "license_states", "recruiter_priority_score", "flag_note"] if col in flagged_data.columns]
     st.dataframe(flagged_data[display_columns])
 
+    # Export the source columns plus the note, not internal helper columns
+    export_data = flagged_data.drop(columns=["is_emergency", "license_states_set"])
     st.download_button(
         label="⬇️ Download Flagged CSV",
-        data=flagged_data.to_csv(index=False).encode('utf-8'),
+        data=_flag_csv(
+            (data_token, tuple(zip(flagged_data["npi"].tolist(), flagged_data["flag_note"].tolist()))),
+            export_data,
+        ),
         file_name="flagged_physicians.csv",
         mime="text/csv"
     )